@@ -1,27 +1,49 @@
+import io
+
 import pandas as pd
 import geopandas as gpd
+import numpy as np
 import pyproj
+import shapely
 
 from geoalchemy2 import Geometry, WKTElement
-from shapely import wkt
 from IPython.display import clear_output
 
 
-def gdf_from_mssql(table, engine, geometry_column='geom', epsg=25832):
+def gdf_from_mssql(table, engine, geometry_column='geom', epsg=25832, columns=None):
+    """Read a table with a geometry column from a MSSQL Server.
+
+    Parameters
+    ----------
+    table : str
+    engine : sqlalchemy.engine.Engine
+    geometry_column : str
+    epsg : int
+        EPSG code, used if the SRID can't be determined from the server.
+    columns : list of str, optional
+        Columns to read in addition to the geometry. Enumerate the columns
+        that are actually needed, for wide tables this saves a lot of
+        transfer and parsing time. By default all columns are read.
 
+    Returns
+    -------
+    gdf : geopandas.GeoDataFrame
+    """
     geom = geometry_column
-    sql = f'SELECT *, {geom}.STAsText() as geometry, {geom}.STSrid as srid FROM {table}'
+    cols = ', '.join(columns) if columns else '*'
+    sql = f'SELECT {cols}, {geom}.STAsBinary() as geometry, {geom}.STSrid as srid FROM {table}'
     df = pd.read_sql(sql, engine)
     srid = df['srid'][0]
-    df.drop(columns=[geom, 'srid'], inplace=True)
-    df['geometry'] = df['geometry'].apply(wkt.loads)
-    gdf = gpd.GeoDataFrame(df)
+    df.drop(columns=[geom, 'srid'], errors='ignore', inplace=True)
+
+    # WKB is about half the size of WKT and faster to parse
+    df['geometry'] = shapely.from_wkb(df['geometry'].to_numpy())
 
     # if we can't determine the epsg code from the MSSQL Server we set it manually
     if srid == 0:
-        gdf.crs = f'EPSG:{epsg}'
-    else:
-        gdf.crs = f'EPSG:{srid}'
+        srid = epsg
+
+    gdf = gpd.GeoDataFrame(df, geometry='geometry', crs=f'EPSG:{srid}')
 
     return gdf
 
@@ -32,29 +54,51 @@ def to_postgis(gdf, name, engine, epsg=3035, if_exists='fail',
     '''This function can be replaced by the new built-in function in geopandas >=0.8
 
     e.g.: gdf.to_postgis(name, engine, schema=None)'''
+    import psycopg2
+
+    # work on a copy so that the caller's gdf is not modified
+    gdf = gdf.copy()
 
-    # make sure the gdf will be in the desired CRS
-    crs = pyproj.CRS(gdf.crs)
-    crs = crs.to_epsg()
-    if not crs == epsg:
+    # make sure the gdf will be in the desired CRS, skip reprojecting equivalent CRS
+    if not pyproj.CRS(gdf.crs).equals(pyproj.CRS.from_epsg(epsg)):
         gdf.to_crs(epsg, inplace=True)
 
-    # Convert Shapely Geometry to WKT and add the SRID
-    gdf['geom'] = gdf['geometry'].apply(lambda x: WKTElement(x.wkt, srid=epsg))
+    # Convert Shapely Geometry to hex encoded EWKB which includes the SRID
+    geoms = shapely.set_srid(np.asarray(gdf.geometry.values), epsg)
+    gdf['geom'] = shapely.to_wkb(geoms, hex=True, include_srid=True)
     # convert column names to lowercase for easier querying
     gdf.columns = map(str.lower, gdf.columns)
     # drop the geometry column as it is now duplicative
-    gdf.drop('geometry', 1, inplace=True)
+    gdf.drop(columns='geometry', inplace=True)
 
-    # set dtype to GeoAlchemy2's Geometry type
+    # the table is created from the first row (so that pandas can infer the
+    # column types) and the remaining rows are streamed with a single COPY
+    # instead of chunked INSERTs
+    first = gdf.head(1).copy()
+    first['geom'] = [WKTElement(geom.wkt, srid=epsg) for geom in geoms[:1]]
+
+    buf = io.StringIO()
+    # write NULL as \N, so that empty strings are not read as NULL by COPY
+    gdf.iloc[1:].to_csv(buf, index=False, header=False, na_rep=r'\N')
+    buf.seek(0)
+
+    table = f'"{name}"' if schema is None else f'"{schema}"."{name}"'
+    columns = ', '.join(f'"{col}"' for col in gdf.columns)
+
+    # a single transaction, if COPY fails the table creation is rolled back as well
     try:
-        gdf.to_sql(name, engine, schema=schema, if_exists=if_exists, index=False,
-                   chunksize=10000, dtype={'geom': Geometry(feature_type, srid=epsg)})
-        # clear the output in case the engine is run with echo=True
-        clear_output()
+        with engine.begin() as conn:
+            # set dtype to GeoAlchemy2's Geometry type
+            first.to_sql(name, conn, schema=schema, if_exists=if_exists, index=False,
+                         dtype={'geom': Geometry(feature_type, srid=epsg)})
+            with conn.connection.cursor() as cur:
+                cur.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buf)
 
-    except ValueError as err:
+    except (ValueError, psycopg2.Error) as err:
         print(f'Dataset {name} could not be uploaded to PostGIS. Error: {err}')
         return False
 
+    # clear the output in case the engine is run with echo=True
+    clear_output()
+
     return True
\ No newline at end of file
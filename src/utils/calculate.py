@@ -1,14 +1,33 @@
-import geopandas as gpd
 import numpy as np
 import shapely
-from tqdm import tqdm
+from joblib import Parallel, delayed, effective_n_jobs
 
 # suppress warnings about initial parquet implementation
 import warnings
 warnings.filterwarnings('ignore', message='.*initial implementation of Parquet.*')
 
 
-def meff(lines, boundary, mask):
+def _meff_chunk(cells, fragments):
+    """Calculate the meff in m² for an array of cells.
+
+    The spatial index is built from the plain geometry array, as this is
+    cheaper than pickling it to a worker.
+    """
+    tree = shapely.STRtree(fragments)
+
+    # all intersecting (cell, fragment) pairs in a single spatial index query
+    cell_idx, fragment_idx = tree.query(cells, predicate='intersects')
+    cells_paired = cells[cell_idx]
+    fragments_paired = fragments[fragment_idx]
+
+    ai = shapely.area(shapely.intersection(cells_paired, fragments_paired))
+    acmpl = shapely.area(fragments_paired)
+    fragments_sum = np.bincount(cell_idx, weights=ai * acmpl, minlength=len(cells))
+
+    return fragments_sum / shapely.area(cells)
+
+
+def meff(lines, boundary, mask, n_jobs=-1, precision=1.0):
     """Calculate the modified effective mesh size.
 
     Merges the lines with the boundary to create a "closed" area.
@@ -21,6 +40,12 @@ def meff(lines, boundary, mask):
     lines : geopoandas.GeoDataFrame (Lines)
     boundary : geopoandas.GeoDataFrame (Polygon)
     mask : geopoandas.GeoDataFrame (Polygons)
+    n_jobs : int
+        Number of parallel workers, -1 uses all cores. Default is `-1`.
+    precision : float
+        Grid size in units of the projection to which the line coordinates
+        are snapped before merging them. Reduces the number of vertices
+        on noisy data. `None` disables it. Default is `1.0` (1 m for epsg:3035).
 
     Returns
     -------
@@ -38,37 +63,30 @@ def meff(lines, boundary, mask):
     # consider to merge lines (they are slightly extended for the process) before using unary_union
     # see: https://gis.stackexchange.com/a/312215/89529
 
-    crs = mask.crs.to_epsg()
     mask = mask.copy()
-    mask['meff'] = np.nan
-
-    lines.geometry.append(boundary.boundary)
-    lines = gpd.GeoDataFrame(geometry=gpd.GeoSeries(lines.unary_union), crs=crs)
-
-    # Transform lines to polygons
-    result, dangles, cuts, invalids = list(shapely.ops.polygonize_full(lines.geometry))
-    lines_polygonized = gpd.GeoDataFrame(geometry=gpd.GeoSeries(result, crs=crs))
-
-    patches = lines_polygonized.explode()
-    patches_sindex = patches.sindex
-
-    for cell in tqdm(mask.itertuples(), total=len(mask), desc='Calculation of the meff_cbc value'):
-        fragments_sum = 0
-
-        fragment_candidates_idx = list(patches_sindex.intersection(cell.geometry.bounds))
-        fragment_candidates = patches.iloc[fragment_candidates_idx]
-        fragments = fragment_candidates[fragment_candidates.intersects(cell.geometry)]
-
-        # this should also be doable with fragments.intersection and pandas functions
-        for fragment in fragments.itertuples():
-            intersection = fragment.geometry.intersection(cell.geometry)
-            ai = intersection.area
-            acmpl = fragment.geometry.area
-            fragments_sum += ai * acmpl
 
-        meff = fragments_sum / cell.geometry.area
-        # convert to km2
-        meff = meff / 1000**2
-        mask.at[cell.Index, 'meff'] = meff
+    all_lines = np.concatenate([np.asarray(lines.geometry.values),
+                                np.asarray(boundary.boundary.values)])
+    if precision:
+        all_lines = shapely.set_precision(all_lines, grid_size=precision)
+    merged = shapely.unary_union(all_lines)
+
+    # Transform lines to polygons, a flat ndarray of the single polygons
+    fragments = shapely.get_parts(shapely.polygonize(shapely.get_parts(merged)))
+    cells = np.asarray(mask.geometry.values)
+
+    n_chunks = effective_n_jobs(n_jobs)
+    if n_chunks == 1:
+        # a single chunk, all cells are queried against the same STRtree
+        meff = _meff_chunk(cells, fragments)
+    else:
+        # split the cells into chunks, smaller than strictly necessary to balance the load
+        n_chunks = max(1, min(n_chunks * 4, len(cells)))
+        results = Parallel(n_jobs=n_jobs, backend='loky')(
+            delayed(_meff_chunk)(chunk, fragments) for chunk in np.array_split(cells, n_chunks))
+        meff = np.concatenate(results)
+
+    # convert to km2
+    mask['meff'] = meff / 1000**2
 
     return mask
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 import affine
@@ -5,6 +6,23 @@ import geopandas as gpd
 import numpy as np
 import rasterio
 import rasterio.warp
+from rasterio.windows import Window
+
+
+def _read_windows(src, size=1024):
+    """Yield the windows in which a raster should be read.
+
+    Uses the internal blocks of tiled files. Striped files are read in
+    full-width bands of `size` rows, so that every strip is decoded once.
+    """
+    _, block_width = src.block_shapes[0]
+
+    if block_width < src.width:
+        for _, window in src.block_windows(1):
+            yield window
+    else:
+        for row_off in range(0, src.height, size):
+            yield Window(0, row_off, src.width, min(size, src.height - row_off))
 
 
 def to_centroids(rast, nodata=0, to_crs=None):
@@ -12,7 +30,8 @@ def to_centroids(rast, nodata=0, to_crs=None):
 
     Returns a `geopandas.GeoDataFrame` with centroids of the input raster
     as the geometry and an additional column for the values of every
-    input band.
+    input band. The raster is read window by window, so the memory
+    footprint does not depend on the size of the raster.
 
     Parameters
     ----------
@@ -28,42 +47,46 @@ def to_centroids(rast, nodata=0, to_crs=None):
     """
 
     with rasterio.open(rast, 'r') as src:
-        # returns a 3d np.ndarray (n_bands, rows, cols)
-        arr = src.read()
-        bands = arr.shape[0]
-        rows = range(arr.shape[1])
-        cols = range(arr.shape[2])
+        bands = src.count
         crs = src.crs
         crs = crs.to_epsg()
 
-        # returns an np.ndarray of same shape as input with Boolean values
-        # True where input raster has a `nodata` value in every band
-        mask = sum(arr) == nodata
+        # collect coordinates and band values of every window
+        xs, ys, properties = [], [], []
+
+        for window in _read_windows(src):
+            # returns a 3d np.ndarray (n_bands, rows, cols)
+            arr = src.read(window=window)
+
+            # returns an np.ndarray of same shape as input with Boolean values
+            # True where input raster has a `nodata` value in every band
+            mask = (arr == nodata).all(axis=0)
+
+            # row and column indices of all pixels that are not masked
+            rr, cc = np.nonzero(~mask)
 
-        # create empty arrays for coordinates and every band
-        xs, ys = [], []
-        properties = [[] for _ in range(bands)]
+            # pixel centre coordinates via the affine transform of the window
+            x, y = src.window_transform(window) * (cc + 0.5, rr + 0.5)
 
-        # get xy.values and band values where raster is not masked
-        for r in rows:
-            for c in cols:
-                if not mask[r, c]:
-                    x, y = src.xy(r, c, offset='center')
-                    for i in range(bands):
-                        properties[i].append(arr[i][r][c])
-                    xs.append(x)
-                    ys.append(y)
+            xs.append(x)
+            ys.append(y)
+            # band values for every unmasked pixel, shape (n_bands, n_points)
+            properties.append(arr[:, rr, cc])
 
-        gdf = gpd.GeoDataFrame(geometry=gpd.points_from_xy(xs,
-                                                           ys,
-                                                           crs=crs))
+    xs = np.concatenate(xs)
+    ys = np.concatenate(ys)
+    properties = np.concatenate(properties, axis=1)
 
-        if to_crs is not None:
-            gdf.to_crs(epsg=to_crs, inplace=True)
+    gdf = gpd.GeoDataFrame(geometry=gpd.points_from_xy(xs,
+                                                       ys,
+                                                       crs=crs))
 
-        # add columns with raster band values to gdf
-        for i in range(bands):
-            gdf[f'b{i+1}'] = properties[i]
+    if to_crs is not None:
+        gdf.to_crs(epsg=to_crs, inplace=True)
+
+    # add columns with raster band values to gdf
+    for i in range(bands):
+        gdf[f'b{i+1}'] = properties[i]
 
     print('epsg:', crs)
     print('n_points:', len(xs))
@@ -133,52 +156,55 @@ def reproject(array=None, profile=None, raster=None, from_crs=None, to_crs=None,
     Takes either a ndarray + profile or a path to a raster file.
     Returns a ndarray + profile.
     """
-    if raster is not None:
-        with rasterio.open(raster) as src:
-            array = src.read(masked=True)
-            profile = src.profile
-
-    elif array is None or profile is None:
-        raise ValueError('Please supply either a raster file or a ndarray and '
-                         'a profile')
-
-    src_crs = profile['crs']
-    if from_crs is not None:
-        src_crs = rasterio.crs.CRS.from_epsg(from_crs)
-    src_height = profile['height']
-    src_width = profile['width']
-    src_transform = profile['transform']
-    src_nodata = profile['nodata']
-    src_bounds = rasterio.transform.array_bounds(src_height,
-                                                 src_width,
-                                                 src_transform)
-
-    print(f'Reprojecting from {src_crs} to EPSG:{to_crs}...')
-
-    dst_transform, dst_width, dst_height = rasterio.warp.calculate_default_transform(
-        src_crs, to_crs, src_width, src_height, *src_bounds)
-
-    dst_profile = profile.copy()
-    dst_profile.update({
-        'crs': to_crs,
-        'transform': dst_transform,
-        'width': dst_width,
-        'height': dst_height,
-        'driver': driver
-    })
-
-    dst = np.zeros((array.shape[0], dst_height, dst_width), array.dtype)
+    with rasterio.Env(GDAL_NUM_THREADS='ALL_CPUS', GDAL_CACHEMAX=512):
+        if raster is not None:
+            with rasterio.open(raster, NUM_THREADS='ALL_CPUS') as src:
+                array = src.read(masked=True)
+                profile = src.profile
+
+        elif array is None or profile is None:
+            raise ValueError('Please supply either a raster file or a ndarray and '
+                             'a profile')
+
+        src_crs = profile['crs']
+        if from_crs is not None:
+            src_crs = rasterio.crs.CRS.from_epsg(from_crs)
+        src_height = profile['height']
+        src_width = profile['width']
+        src_transform = profile['transform']
+        src_nodata = profile['nodata']
+        src_bounds = rasterio.transform.array_bounds(src_height,
+                                                     src_width,
+                                                     src_transform)
+
+        print(f'Reprojecting from {src_crs} to EPSG:{to_crs}...')
+
+        dst_transform, dst_width, dst_height = rasterio.warp.calculate_default_transform(
+            src_crs, to_crs, src_width, src_height, *src_bounds)
+
+        dst_profile = profile.copy()
+        dst_profile.update({
+            'crs': to_crs,
+            'transform': dst_transform,
+            'width': dst_width,
+            'height': dst_height,
+            'driver': driver
+        })
 
-    rasterio.warp.reproject(
-        source=array,
-        destination=dst,
-        src_transform=src_transform,
-        src_crs=src_crs,
-        src_nodata=src_nodata,
-        dst_transform=dst_transform,
-        dst_crs=to_crs,
-        dst_nodata=src_nodata,
-        resampling=rasterio.warp.Resampling.nearest)
+        dst = np.zeros((array.shape[0], dst_height, dst_width), array.dtype)
+
+        rasterio.warp.reproject(
+            source=array,
+            destination=dst,
+            src_transform=src_transform,
+            src_crs=src_crs,
+            src_nodata=src_nodata,
+            dst_transform=dst_transform,
+            dst_crs=to_crs,
+            dst_nodata=src_nodata,
+            resampling=rasterio.warp.Resampling.nearest,
+            num_threads=os.cpu_count(),
+            warp_mem_limit=512)
 
     print('---Reprojection successful---')
     return dst, dst_profile
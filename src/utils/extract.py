@@ -1,12 +1,15 @@
 # import fiona
 import geopandas as gpd
 import matplotlib.pyplot as plt
+import numpy as np
 import rasterio
 import rasterio.mask as riomask
 
 from math import ceil, floor
-from rasterio.io import MemoryFile
+from rasterio.errors import WindowError
+from rasterio.features import geometry_mask
 from rasterio.plot import show as rioshow
+from rasterio.windows import Window, from_bounds
 from shapely.geometry import mapping, Polygon
 
 
@@ -105,29 +108,62 @@ def clip(array=None, profile=None, vector=None, raster=None, all_touched=True,
     else:
         raise ValueError('Please specify a valid vector path or GeoDataFrame.')
 
-    if raster is not None:
-        with rasterio.open(raster) as src:
-            array = src.read(masked=masked)
-            profile = src.profile
-
-    elif array is None or profile is None:
-        raise ValueError('Please supply either a raster file or a ndarray and '
-                         'a profile')
-
-    if extent:
-        polygon = bbox_polygon(*gdf.total_bounds)
-        shapes = [mapping(polygon)]
-    else:
-        shapes = [feat['geometry'] for feat in gdf.geometry.__geo_interface__['features']]
-
-    memfile = MemoryFile()
-    with memfile.open(**profile) as mem:
-        mem.write(array)
-        dst_array, dst_transform = riomask.mask(mem,
-                                                shapes,
-                                                all_touched=all_touched,
-                                                crop=True,
-                                                filled=masked)
+    with rasterio.Env(GDAL_NUM_THREADS='ALL_CPUS', GDAL_CACHEMAX=512):
+        if raster is not None:
+            with rasterio.open(raster, NUM_THREADS='ALL_CPUS') as src:
+                array = src.read(masked=masked)
+                profile = src.profile
+
+        elif array is None or profile is None:
+            raise ValueError('Please supply either a raster file or a ndarray and '
+                             'a profile')
+
+        if extent:
+            polygon = bbox_polygon(*gdf.total_bounds)
+            shapes = [mapping(polygon)]
+        else:
+            # map the geometries directly instead of building the
+            # __geo_interface__ of the whole GeoSeries
+            shapes = [mapping(geom) for geom in gdf.geometry.values]
+
+    # crop to the window of the shape bounds, outermost pixels included
+    # (floor of the offsets, ceiling of the far edges) as rasterio.mask does
+    bounds_window = from_bounds(*gdf.total_bounds, transform=profile['transform'])
+    row_start = floor(bounds_window.row_off)
+    col_start = floor(bounds_window.col_off)
+    row_stop = ceil(bounds_window.row_off + bounds_window.height)
+    col_stop = ceil(bounds_window.col_off + bounds_window.width)
+    try:
+        window = Window(col_start, row_start,
+                        max(col_stop - col_start, 0), max(row_stop - row_start, 0))
+        window = window.intersection(Window(0, 0, profile['width'], profile['height']))
+    except WindowError:
+        raise ValueError('Input shapes do not overlap raster.')
+
+    r0, c0 = int(window.row_off), int(window.col_off)
+    r1, c1 = r0 + int(window.height), c0 + int(window.width)
+    dst_transform = rasterio.windows.transform(Window(c0, r0, c1 - c0, r1 - r0),
+                                               profile['transform'])
+
+    # rasterize the shapes for the window only instead of writing the array
+    # to a MemoryFile and using rasterio.mask.mask on it
+    inside = geometry_mask(shapes,
+                           out_shape=(r1 - r0, c1 - c0),
+                           transform=dst_transform,
+                           all_touched=all_touched,
+                           invert=True)
+
+    # mask pixels outside of the shapes and pixels which are nodata already
+    nodata = profile['nodata'] if profile['nodata'] is not None else 0
+    # copy, so that the result does not share memory with the input array
+    data = np.ma.getdata(array)[:, r0:r1, c0:c1].copy()
+    outside = ~inside | np.ma.getmaskarray(array)[:, r0:r1, c0:c1]
+    if profile['nodata'] is not None:
+        outside |= data == profile['nodata']
+
+    dst_array = np.ma.masked_array(data, mask=outside)
+    if masked:
+        dst_array = dst_array.filled(nodata)
 
     dst_profile = profile.copy()
     dst_profile.update({"height": dst_array.shape[1],
@@ -140,19 +176,20 @@ def clip(array=None, profile=None, vector=None, raster=None, all_touched=True,
 
 
 def subset(raster, gdf):
-    with rasterio.open(raster) as src:
-        # Round to avoid error where the output raster is falsely offset
-        # an Alternative solution might be:
-        #     transform = rasterio.windows.transform(window, dataset.transform)
-        llx, lly, urx, ury = gdf.total_bounds
-        bounds = (floor(llx), floor(lly), ceil(urx), ceil(ury))
-        win = src.window(*bounds)
-
-        win_profile = src.profile.copy()
-        win_profile['transform'] = src.window_transform(win)
-        win_profile['height'] = win.height
-        win_profile['width'] = win.width
-
-        win_array = src.read(window=win)
+    with rasterio.Env(GDAL_NUM_THREADS='ALL_CPUS', GDAL_CACHEMAX=512):
+        with rasterio.open(raster, NUM_THREADS='ALL_CPUS') as src:
+            # Round to avoid error where the output raster is falsely offset
+            # an Alternative solution might be:
+            #     transform = rasterio.windows.transform(window, dataset.transform)
+            llx, lly, urx, ury = gdf.total_bounds
+            bounds = (floor(llx), floor(lly), ceil(urx), ceil(ury))
+            win = src.window(*bounds)
+
+            win_profile = src.profile.copy()
+            win_profile['transform'] = src.window_transform(win)
+            win_profile['height'] = win.height
+            win_profile['width'] = win.width
+
+            win_array = src.read(window=win)
 
         return win_array, win_profile
@@ -14,6 +14,7 @@ import rasterio
 import seaborn as sns
 import spatialpandas as spd
 from math import ceil, sqrt
+from rasterio.enums import Resampling
 from rasterio.plot import show as rioshow
 from sklearn.ensemble import ExtraTreesClassifier
 # from datashader import transfer_functions as tf
@@ -32,11 +33,12 @@ hd.shade.cmap = ["lightblue", "darkblue"]
 
 def feature_importances(X, y, figsize=(10, 10)):
     # Compute the impurity-based feature importances with an ExtraTreesClassifier
-    model = ExtraTreesClassifier()
+    # the trees are independent and are fitted in parallel on all cores
+    model = ExtraTreesClassifier(n_estimators=100, n_jobs=-1, random_state=0)
     model.fit(X, y)
 
     importances = pd.Series(model.feature_importances_, index=X.columns)
-    std = np.std([tree.feature_importances_ for tree in model.estimators_], axis=0)
+    std = np.std(np.stack([tree.feature_importances_ for tree in model.estimators_]), axis=0)
     indices = np.argsort(importances)[::-1]
 
     # feat_importances = pd.Series(model.feature_importances_, index=X.columns)
@@ -92,15 +94,29 @@ def multiplot_raster(folder=None, files=None, arrays=None):
     fig, ax = plt.subplots(nrows=nrows, ncols=ncols, sharex=True, sharey=True, figsize=(16,16))
     ax = ax.flatten()
 
+    # approximate size of a single panel in screen pixels
+    panel_width, panel_height = fig.get_size_inches() * fig.dpi / (ncols, nrows)
+
     for i, img in enumerate(data):
         _ax = ax[i]
+        kwargs = {}
 
         if not in_memory:
             _ax.set_title(f'{img.name}')
             with rasterio.open(img) as src:
-                img = src.read(masked=True)
-
-        rioshow(img, ax=_ax)
+                # only read as many pixels as can be displayed, this makes
+                # use of overviews if the file has any
+                scale = min(1, panel_width / src.width, panel_height / src.height)
+                out_shape = (src.count,
+                             max(1, round(src.height * scale)),
+                             max(1, round(src.width * scale)))
+                img = src.read(out_shape=out_shape,
+                               resampling=Resampling.average,
+                               masked=True)
+                # keep the axes in pixel coordinates of the full resolution raster
+                kwargs['extent'] = (-0.5, src.width - 0.5, src.height - 0.5, -0.5)
+
+        rioshow(img, ax=_ax, **kwargs)
 
     if nplots < len(ax):
         for _ in ax[nplots:]:
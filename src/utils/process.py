@@ -3,8 +3,6 @@ import pandas as pd
 
 def merge_features(lst, ignore_duplicates=True, merge_on='cellcode'):
 
-    lst = list(reversed(lst))
-
     if ignore_duplicates:
         cols_set_list = [set(df.columns) for df in lst]
         cols_common = set.intersection(*cols_set_list)
@@ -12,11 +10,20 @@ def merge_features(lst, ignore_duplicates=True, merge_on='cellcode'):
     else:
         cols_duplicate = []
 
-    gdf = lst.pop()
+    first, *others = lst
+    others = [df.drop(columns=cols_duplicate) for df in others]
+
+    # a single index-aligned join only equals successive merges if the keys
+    # are unique and no column names overlap (pd.merge would add suffixes)
+    cols = [col for df in [first] + others for col in df.columns if col != merge_on]
+    unique_keys = all(df[merge_on].is_unique for df in others)
 
-    while len(lst) > 0:
-        gdf_append = lst.pop()
-        gdf_append = gdf_append.drop(columns=cols_duplicate)
-        gdf = pd.merge(gdf, gdf_append, on=merge_on)
+    if others and unique_keys and len(cols) == len(set(cols)):
+        right = pd.concat([df.set_index(merge_on) for df in others], axis=1, join='inner')
+        gdf = first.join(right, on=merge_on, how='inner').reset_index(drop=True)
+    else:
+        gdf = first
+        for gdf_append in others:
+            gdf = pd.merge(gdf, gdf_append, on=merge_on)
 
     return gdf